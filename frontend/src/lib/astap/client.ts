@@ -17,6 +17,10 @@ const MAX_POLL_ATTEMPTS = 150; // 5 minutes max wait time (150 * 2s)
 // Upload timeout (2 minutes for file upload)
 const UPLOAD_TIMEOUT_MS = 120000;
 
+// Retry configuration when the solver queue or scratch space is full (503/507)
+const SUBMIT_MAX_RETRIES = 5;
+const SUBMIT_RETRY_BASE_MS = 5000; // 5s, doubling each retry
+
 export interface PlateSolveOptions {
   // FOV hint in degrees
   fov?: number;
@@ -121,24 +125,35 @@ export async function solveFieldWithFile(
       formData.append('downsample', options.downsampleFactor.toString());
     }
 
-    // Submit the job
-    const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), UPLOAD_TIMEOUT_MS);
-
+    // Submit the job, backing off while the solver is busy
     let submitResponse: Response;
-    try {
-      submitResponse = await fetch(`${ASTAP_URL}/solve`, {
-        method: 'POST',
-        body: formData,
-        signal: controller.signal,
-      });
-      clearTimeout(timeoutId);
-    } catch (error) {
-      clearTimeout(timeoutId);
-      if (error instanceof Error && error.name === 'AbortError') {
-        throw new Error(`Upload timed out after ${UPLOAD_TIMEOUT_MS / 1000} seconds`);
+    for (let attempt = 0; ; attempt++) {
+      const controller = new AbortController();
+      const timeoutId = setTimeout(() => controller.abort(), UPLOAD_TIMEOUT_MS);
+
+      try {
+        submitResponse = await fetch(`${ASTAP_URL}/solve`, {
+          method: 'POST',
+          body: formData,
+          signal: controller.signal,
+        });
+        clearTimeout(timeoutId);
+      } catch (error) {
+        clearTimeout(timeoutId);
+        if (error instanceof Error && error.name === 'AbortError') {
+          throw new Error(`Upload timed out after ${UPLOAD_TIMEOUT_MS / 1000} seconds`);
+        }
+        throw error;
+      }
+
+      const busy = submitResponse.status === 503 || submitResponse.status === 507;
+      if (!busy || attempt >= SUBMIT_MAX_RETRIES) {
+        break;
       }
-      throw error;
+
+      const delayMs = SUBMIT_RETRY_BASE_MS * 2 ** attempt;
+      console.log(`  ⏳ ASTAP solver busy (${submitResponse.status}), retrying in ${delayMs / 1000}s...`);
+      await new Promise((resolve) => setTimeout(resolve, delayMs));
     }
 
     if (!submitResponse.ok) {
@@ -6,13 +6,17 @@ with a Redis-backed job queue for handling concurrent requests.
 
 Endpoints:
   POST /solve - Submit an image for plate solving (returns job ID)
+  POST /solve_batch - Submit several frames of one field (returns job IDs)
+  GET /batch/<batch_id> - Get batch progress
   GET /job/<job_id> - Get job status and results
   GET /health - Health check endpoint
   GET /queue - Get queue status
 """
 
 import os
-import json
+import re
+import hashlib
+import shutil
 import subprocess
 import tempfile
 import uuid
@@ -20,8 +24,9 @@ import time
 import threading
 from pathlib import Path
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify
 from werkzeug.utils import secure_filename
+import orjson
 import redis
 
 app = Flask(__name__)
@@ -35,21 +40,104 @@ REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', 2))
 JOB_EXPIRY_SECONDS = int(os.environ.get('JOB_EXPIRY_SECONDS', 86400))  # 24 hours
 TEMP_DIR = os.environ.get('TEMP_DIR', '/tmp/astap-jobs')
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 0))  # Uploads waiting in TEMP_DIR (0 = unbounded)
+MAX_JOB_WAIT_SECONDS = 60  # Cap for GET /job/<job_id>?wait=
+MAX_JOB_WAITERS = int(os.environ.get('MAX_JOB_WAITERS', 4))  # Keep below the gunicorn thread count
+HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 2))
+UPLOAD_BUFFER_SIZE = 1024 * 1024  # 1MB read chunks when hashing uploads
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 32))
+SOLVE_CACHE_SECONDS = int(os.environ.get('SOLVE_CACHE_SECONDS', 7 * 86400))  # 7 days
+SOLVER_OUTPUT_LIMIT = 4096  # Keep only the tail of ASTAP stdout/stderr in results
 
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
+# Optional /solve form fields and how to parse them
+SOLVE_OPTION_PARSERS = {
+    'fov': float,
+    'ra': float,
+    'dec': float,
+    'downsample': int,
+}
+
+# Matches "KEY = value / comment" cards, capturing the key and a quoted
+# string or bare value (comments are left out)
+WCS_CARD_RE = re.compile(r"^\s*([A-Z0-9_-]+)\s*=\s*('[^']*'|[^\s/]+)", re.MULTILINE)
+
 # Ensure temp directory exists
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Redis connection
-redis_client = None
+
+class UploadRequest(Request):
+    """Request that spools multipart file uploads into TEMP_DIR."""
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        # Werkzeug spools parts over 500KB to the system temp dir (container
+        # disk); keep them on the TEMP_DIR tmpfs with the rest of the job data.
+        # A named file lets save_upload link it into place instead of copying.
+        return tempfile.NamedTemporaryFile(mode='wb+', dir=TEMP_DIR)
+
+
+app.request_class = UploadRequest
+
+
+def get_filesystem_type(path: str) -> str:
+    """Get the filesystem type of the mount containing path (Linux only)."""
+    path = os.path.realpath(path)
+    fs_type, best = 'unknown', ''
+    try:
+        with open('/proc/mounts', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1]
+                prefix = mount_point.rstrip('/') + '/'
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) > len(best):
+                    fs_type, best = fields[2], mount_point
+    except OSError:
+        pass
+    return fs_type
+
+
+# Uploads and ASTAP output are written to TEMP_DIR, so it should be in memory
+temp_dir_fs = get_filesystem_type(TEMP_DIR)
+print(f"TEMP_DIR {TEMP_DIR} is on {temp_dir_fs}")
+if temp_dir_fs != 'tmpfs':
+    print("Warning: TEMP_DIR is not on tmpfs; mount a tmpfs there to keep solver I/O off disk")
+
+# Redis connection pool shared by request handlers and job processing.
+# Blocking commands (BLPOP) use their own connections, see worker_loop.
+redis_pool = redis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=5,
+    decode_responses=True,
+)
+
+# Long-poll subscriptions hold a connection for their whole wait, so they
+# get their own pool instead of starving request handlers
+pubsub_pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
+
+# Each long-poll occupies a gunicorn thread for its whole wait, so only let a
+# few run at once; the rest are answered straight away like a normal poll
+job_waiters = threading.BoundedSemaphore(MAX_JOB_WAITERS)
 
 def get_redis():
-    """Get Redis connection, reconnecting if needed."""
-    global redis_client
-    if redis_client is None:
-        redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-    return redis_client
+    """Get a Redis client backed by the shared connection pool."""
+    return redis.Redis(connection_pool=redis_pool)
+
+
+def dumps(obj) -> str:
+    """Serialize to a JSON string for storage in Redis."""
+    return orjson.dumps(obj).decode()
+
+
+loads = orjson.loads
+
+
+# Last health check result: (monotonic timestamp, payload, status code)
+health_cache = (0.0, None, 503)
 
 
 def allowed_file(filename: str) -> bool:
@@ -61,26 +149,24 @@ def parse_wcs_file(wcs_path: str) -> dict:
     """Parse the WCS output file from ASTAP to extract coordinates."""
     result = {}
 
-    if not os.path.exists(wcs_path):
+    # ASTAP doesn't write a .wcs file when the solve fails
+    try:
+        with open(wcs_path, 'r') as f:
+            text = f.read()
+    except FileNotFoundError:
         return result
 
-    with open(wcs_path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if '=' in line:
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.split('/')[0].strip()  # Remove comments
-
-                # Remove quotes from string values
-                if value.startswith("'") and value.endswith("'"):
-                    value = value[1:-1].strip()
+    for key, value in WCS_CARD_RE.findall(text):
+        # Remove quotes from string values
+        if value.startswith("'"):
+            result[key] = value[1:-1].strip()
+            continue
 
-                # Try to parse as float
-                try:
-                    result[key] = float(value)
-                except ValueError:
-                    result[key] = value
+        # Try to parse as float
+        try:
+            result[key] = float(value)
+        except ValueError:
+            result[key] = value
 
     return result
 
@@ -89,13 +175,18 @@ def run_astap_solver(image_path: str, options: dict = None) -> dict:
     """
     Run ASTAP solver on an image.
 
+    ASTAP always writes .ini and .wcs output next to the image (there is no
+    flag to suppress either; .log is only written with -log, which is never
+    passed), so the image should live in a per-job working directory that
+    the caller removes.
+
     Args:
         image_path: Path to the image file
         options: Optional dict with solver options:
             - fov: Field of view in degrees (helps narrow search)
-            - ra: Approximate RA hint (degrees)
+            - ra: Approximate RA hint (degrees, converted to hours for ASTAP)
             - dec: Approximate Dec hint (degrees)
-            - downsample: Downsample factor (1-4)
+            - downsample: Downsample factor (1-4, or 0 for auto; defaults to auto)
 
     Returns:
         Dict with solve results
@@ -116,32 +207,30 @@ def run_astap_solver(image_path: str, options: dict = None) -> dict:
 
     # Add center hint if provided
     if 'ra' in options and 'dec' in options:
-        cmd.extend(['-ra', str(options['ra']), '-spd', str(90 + options['dec'])])
+        cmd.extend(['-ra', str(options['ra'] / 15), '-spd', str(90 + options['dec'])])
         cmd.extend(['-r', '30'])  # Reduce search radius when hint provided
 
-    # Add downsample if needed for large images
-    if 'downsample' in options:
-        cmd.extend(['-z', str(options['downsample'])])
+    # Downsample large images; without a caller value let ASTAP pick the
+    # factor from the image dimensions (-z 0)
+    cmd.extend(['-z', str(options.get('downsample', 0))])
 
     # Run solver
     try:
         result = subprocess.run(
             cmd,
             capture_output=True,
-            text=True,
             timeout=300  # 5 minute timeout
         )
 
-        stdout = result.stdout
-        stderr = result.stderr
+        # Capture raw bytes and decode only the tail that is kept
+        stdout = result.stdout[-SOLVER_OUTPUT_LIMIT:].decode(errors='replace')
+        stderr = result.stderr[-SOLVER_OUTPUT_LIMIT:].decode(errors='replace')
 
         # Check for WCS output file
         wcs_path = image_path.rsplit('.', 1)[0] + '.wcs'
 
         # Parse WCS if solve was successful
-        wcs_data = {}
-        if os.path.exists(wcs_path):
-            wcs_data = parse_wcs_file(wcs_path)
+        wcs_data = parse_wcs_file(wcs_path)
 
         # Check if solved by looking for CRVAL1/CRVAL2 (center coordinates)
         solved = 'CRVAL1' in wcs_data and 'CRVAL2' in wcs_data
@@ -181,98 +270,141 @@ def run_astap_solver(image_path: str, options: dict = None) -> dict:
             'solved': False,
             'error': str(e),
         }
-    finally:
-        # Cleanup temporary files
-        for ext in ['.wcs', '.ini', '.log']:
-            cleanup_path = image_path.rsplit('.', 1)[0] + ext
-            if os.path.exists(cleanup_path):
-                try:
-                    os.remove(cleanup_path)
-                except:
-                    pass
 
 
 def process_job(job_id: str):
     """Process a plate solving job."""
     r = get_redis()
     job_key = f"job:{job_id}"
+    batch_key = None
+    workdir = None
+    image_path = None
 
     try:
-        # Get job data
-        job_data = r.hgetall(job_key)
-        if not job_data:
-            return
-
-        # Update status to processing
-        r.hset(job_key, mapping={
+        # Add to processing set, get job data and mark it as processing
+        # in one round-trip
+        pipe = r.pipeline(transaction=False)
+        pipe.sadd('processing_jobs', job_id)
+        pipe.hgetall(job_key)
+        pipe.hset(job_key, mapping={
             'status': 'processing',
             'started_at': datetime.utcnow().isoformat(),
         })
+        _, job_data, _ = pipe.execute()
+        if not job_data:
+            # The job expired; drop the hash the HSET above just created
+            pipe = r.pipeline(transaction=False)
+            pipe.delete(job_key)
+            pipe.srem('processing_jobs', job_id)
+            pipe.execute()
+            return
+        if job_data.get('status') == 'cancelled':
+            # Cancelled after BLPOP popped it; the cancel already settled
+            # the batch count and removed the upload
+            pipe = r.pipeline(transaction=False)
+            pipe.hset(job_key, 'status', 'cancelled')
+            pipe.hdel(job_key, 'started_at')
+            pipe.srem('processing_jobs', job_id)
+            pipe.execute()
+            return
 
         # Get image path and options
         image_path = job_data.get('image_path')
-        options = json.loads(job_data.get('options', '{}'))
+        options = loads(job_data.get('options', '{}'))
 
-        # Run the solver
-        result = run_astap_solver(image_path, options)
+        if job_data.get('batch_id'):
+            batch_key = f"batch:{job_data['batch_id']}"
 
-        # Update job with results
-        r.hset(job_key, mapping={
-            'status': 'completed',
-            'completed_at': datetime.utcnow().isoformat(),
-            'result': json.dumps(result),
-        })
+        # Reuse a previous solution for identical image content
+        content_hash = job_data.get('content_hash')
+        cached = r.get(f"wcs:{content_hash}") if content_hash else None
+
+        if cached:
+            result = loads(cached)
+            result['cached'] = True
 
-        # Cleanup image file
-        if image_path and os.path.exists(image_path):
+            # ASTAP won't run, so the upload is no longer needed
             try:
                 os.remove(image_path)
-            except:
+            except FileNotFoundError:
                 pass
+        else:
+            # Seed position hints from an already solved frame of the same batch
+            if batch_key:
+                hint = r.hget(batch_key, 'hint')
+                if hint:
+                    options = {**loads(hint), **options}
+
+            # Move the image into its own working directory so ASTAP output
+            # can't collide with other jobs and cleanup is a single rmtree
+            workdir = tempfile.mkdtemp(dir=TEMP_DIR)
+            solve_path = os.path.join(workdir, 'image' + os.path.splitext(image_path)[1])
+            os.replace(image_path, solve_path)
+
+            # Run the solver
+            result = run_astap_solver(solve_path, options)
+
+            # Cache successful solves
+            if content_hash and result.get('solved'):
+                r.setex(f"wcs:{content_hash}", SOLVE_CACHE_SECONDS, dumps(result))
+
+        # Update job with results and remove from processing set
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(job_key, mapping={
+            'status': 'completed',
+            'completed_at': datetime.utcnow().isoformat(),
+            'result': dumps(result),
+        })
+        pipe.srem('processing_jobs', job_id)
+        if batch_key:
+            pipe.hincrby(batch_key, 'pending', -1)
+            if result.get('solved'):
+                hint = {'ra': result['ra'], 'dec': result['dec']}
+                if result.get('fieldh'):
+                    hint['fov'] = result['fieldh']
+                pipe.hsetnx(batch_key, 'hint', dumps(hint))
+        pipe.publish(f"{job_key}:done", 'completed')
+        pipe.execute()
 
     except Exception as e:
-        # Update job with error
-        r.hset(job_key, mapping={
+        # Update job with error and remove from processing set
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(job_key, mapping={
             'status': 'failed',
             'completed_at': datetime.utcnow().isoformat(),
-            'result': json.dumps({
+            'result': dumps({
                 'success': False,
                 'solved': False,
                 'error': str(e),
             }),
         })
+        pipe.srem('processing_jobs', job_id)
+        if batch_key:
+            pipe.hincrby(batch_key, 'pending', -1)
+        pipe.publish(f"{job_key}:done", 'failed')
+        pipe.execute()
     finally:
-        # Decrement active jobs counter
-        r.decr('active_jobs')
-        # Remove from processing set
-        r.srem('processing_jobs', job_id)
+        # Cleanup the image and all ASTAP output files
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        elif image_path:
+            # Failed before the upload was moved into a workdir
+            try:
+                os.remove(image_path)
+            except FileNotFoundError:
+                pass
 
 
 def worker_loop():
-    """Background worker that processes jobs from the queue."""
-    r = get_redis()
+    """Background worker that blocks on the queue and processes jobs inline."""
+    # BLPOP holds its connection for the duration of the wait, so each worker
+    # gets a dedicated client instead of sharing the request-serving one.
+    r = redis.from_url(REDIS_URL, decode_responses=True)
 
     while True:
         try:
-            # Check if we can process more jobs
-            active_jobs = int(r.get('active_jobs') or 0)
-
-            if active_jobs < MAX_CONCURRENT_JOBS:
-                # Try to get a job from the queue (blocking with timeout)
-                job_data = r.blpop('job_queue', timeout=1)
-
-                if job_data:
-                    _, job_id = job_data
-                    # Increment active jobs counter
-                    r.incr('active_jobs')
-                    # Add to processing set
-                    r.sadd('processing_jobs', job_id)
-                    # Process the job in a thread
-                    thread = threading.Thread(target=process_job, args=(job_id,))
-                    thread.start()
-            else:
-                # Wait a bit before checking again
-                time.sleep(0.5)
+            _, job_id = r.blpop('job_queue', 0)
+            process_job(job_id)
 
         except redis.ConnectionError:
             # Redis connection lost, wait and retry
@@ -282,19 +414,61 @@ def worker_loop():
             time.sleep(1)
 
 
-# Start worker thread
-worker_thread = threading.Thread(target=worker_loop, daemon=True)
-worker_thread.start()
+def warm_star_database():
+    """Ask the kernel to read the star database into the page cache."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+
+    started = time.monotonic()
+    warmed = 0
+    for root, _, files in os.walk(STAR_DATABASE):
+        for name in files:
+            try:
+                fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                warmed += 1
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    print(f"Star database warm-up requested for {warmed} files in {time.monotonic() - started:.1f}s")
+
+
+# Prefetch the star database in the background so the first solve after
+# startup doesn't pay for cold page faults
+threading.Thread(target=warm_star_database, name='astap-warmup', daemon=True).start()
+
+# Start a fixed pool of worker threads; concurrency is bounded by pool size.
+# The pool is per process, so the service must run as a single process
+# (gunicorn --workers 1) for MAX_CONCURRENT_JOBS to be the real limit.
+for i in range(MAX_CONCURRENT_JOBS):
+    threading.Thread(target=worker_loop, name=f'astap-worker-{i}', daemon=True).start()
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint."""
+    global health_cache
+
+    # Serve a recent result to keep frequent probes cheap
+    now = time.monotonic()
+    checked_at, payload, status_code = health_cache
+    if payload is not None and now - checked_at < HEALTH_CACHE_SECONDS:
+        return jsonify(payload), status_code
+
     # Check if ASTAP binary exists
     astap_exists = os.path.exists(ASTAP_CLI)
 
-    # Check if star database exists
-    db_exists = os.path.isdir(STAR_DATABASE) and len(os.listdir(STAR_DATABASE)) > 0
+    # Check if star database exists (stop at the first entry)
+    try:
+        with os.scandir(STAR_DATABASE) as entries:
+            db_exists = next(entries, None) is not None
+    except OSError:
+        db_exists = False
 
     # Check Redis connection
     redis_ok = False
@@ -306,19 +480,22 @@ def health():
         pass
 
     if astap_exists and db_exists and redis_ok:
-        return jsonify({
+        payload, status_code = {
             'status': 'healthy',
             'astap': ASTAP_CLI,
             'database': STAR_DATABASE,
             'redis': 'connected',
-        })
+        }, 200
     else:
-        return jsonify({
+        payload, status_code = {
             'status': 'unhealthy',
             'astap_exists': astap_exists,
             'database_exists': db_exists,
             'redis_connected': redis_ok,
-        }), 503
+        }, 503
+
+    health_cache = (now, payload, status_code)
+    return jsonify(payload), status_code
 
 
 @app.route('/queue', methods=['GET'])
@@ -327,7 +504,7 @@ def queue_status():
     try:
         r = get_redis()
         queue_length = r.llen('job_queue')
-        active_jobs = int(r.get('active_jobs') or 0)
+        active_jobs = r.scard('processing_jobs')
         processing_jobs = list(r.smembers('processing_jobs'))
 
         return jsonify({
@@ -335,11 +512,120 @@ def queue_status():
             'processing': active_jobs,
             'processing_jobs': processing_jobs,
             'max_concurrent': MAX_CONCURRENT_JOBS,
+            'max_queued': MAX_QUEUED_JOBS or None,
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def upload_too_large() -> bool:
+    """Check the declared request size before any of the body is read."""
+    return request.content_length is not None and request.content_length > MAX_FILE_SIZE
+
+
+def queue_is_full(new_jobs: int = 1) -> bool:
+    """Check whether queuing more jobs would exceed MAX_QUEUED_JOBS (if set)."""
+    if MAX_QUEUED_JOBS <= 0:
+        return False
+    return get_redis().llen('job_queue') + new_jobs > MAX_QUEUED_JOBS
+
+
+def queue_full_response():
+    """JSON error response for a full job queue."""
+    return jsonify({
+        'success': False,
+        'error': f'Job queue is full ({MAX_QUEUED_JOBS} jobs). Try again later.',
+    }), 503
+
+
+def storage_full_response():
+    """JSON error response for an upload that couldn't be written to TEMP_DIR."""
+    return jsonify({
+        'success': False,
+        'error': 'Insufficient storage for upload. Try again later.',
+    }), 507
+
+
+def validate_upload(file):
+    """Return an error message if the uploaded file is unusable, else None."""
+    if file.filename == '':
+        return 'No file selected'
+
+    if not allowed_file(file.filename):
+        return f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'
+
+    return None
+
+
+def parse_solve_options(form) -> dict:
+    """Parse optional solver hints from the submitted form."""
+    options = {}
+
+    for key, parse in SOLVE_OPTION_PARSERS.items():
+        value = form.get(key)
+        if value is not None:
+            try:
+                options[key] = parse(value)
+            except ValueError:
+                pass
+
+    # A center hint needs both coordinates
+    if 'ra' not in options or 'dec' not in options:
+        options.pop('ra', None)
+        options.pop('dec', None)
+
+    return options
+
+
+def save_upload(file, job_id: str) -> tuple:
+    """
+    Save an uploaded file to the temp directory.
+
+    The upload is already spooled to a named file in TEMP_DIR (see
+    UploadRequest), so it is hard-linked into place rather than copied.
+
+    Returns:
+        Tuple of (sanitized filename, saved path, content hash)
+    """
+    filename = secure_filename(file.filename)
+    unique_filename = f"{job_id}_{filename}"
+    temp_path = os.path.join(TEMP_DIR, unique_filename)
+
+    # Hash the content so repeat submissions hit the solve cache
+    # (seeking also flushes anything Werkzeug still has buffered)
+    digest = hashlib.blake2b(digest_size=16)
+    stream = file.stream
+    stream.seek(0)
+    while chunk := stream.read(UPLOAD_BUFFER_SIZE):
+        digest.update(chunk)
+
+    # The spool file is deleted when the request closes; the link keeps the data
+    os.link(stream.name, temp_path)
+
+    return filename, temp_path, digest.hexdigest()
+
+
+def queue_job(pipe, job_id: str, filename: str, image_path: str,
+              content_hash: str, options: dict, batch_id: str = None):
+    """Add the commands that store and enqueue a job to a Redis pipeline."""
+    job_key = f"job:{job_id}"
+    job = {
+        'id': job_id,
+        'status': 'queued',
+        'created_at': datetime.utcnow().isoformat(),
+        'filename': filename,
+        'image_path': image_path,
+        'content_hash': content_hash,
+        'options': dumps(options),
+    }
+    if batch_id:
+        job['batch_id'] = batch_id
+
+    pipe.hset(job_key, mapping=job)
+    pipe.expire(job_key, JOB_EXPIRY_SECONDS)
+    pipe.rpush('job_queue', job_id)
+
+
 @app.route('/solve', methods=['POST'])
 def solve():
     """
@@ -350,86 +636,216 @@ def solve():
         fov: (optional) Field of view hint in degrees
         ra: (optional) RA hint in degrees
         dec: (optional) Dec hint in degrees
-        downsample: (optional) Downsample factor (1-4)
+        downsample: (optional) Downsample factor (1-4, 0 for auto; default auto)
 
     Returns:
         JSON with job_id for polling status
     """
+    if upload_too_large():
+        return jsonify({
+            'success': False,
+            'error': f'Upload exceeds {MAX_FILE_SIZE // (1024 * 1024)}MB limit',
+        }), 413
+
+    # Every queued upload waits in TEMP_DIR, so bound the queue before
+    # request.files spools the body there
+    if queue_is_full():
+        return queue_full_response()
+
     # Check for file
-    if 'file' not in request.files:
+    try:
+        file = request.files.get('file')
+    except OSError:
+        return storage_full_response()
+
+    if file is None:
         return jsonify({'success': False, 'error': 'No file provided'}), 400
 
-    file = request.files['file']
+    error = validate_upload(file)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
 
-    if file.filename == '':
-        return jsonify({'success': False, 'error': 'No file selected'}), 400
+    # Get optional parameters
+    options = parse_solve_options(request.form)
 
-    if not allowed_file(file.filename):
+    # Generate job ID and save file to temp directory
+    job_id = str(uuid.uuid4())
+    try:
+        filename, temp_path, content_hash = save_upload(file, job_id)
+    except OSError:
+        return storage_full_response()
+
+    # Store job, set expiry, enqueue and get queue position in one round-trip
+    pipe = get_redis().pipeline(transaction=False)
+    queue_job(pipe, job_id, filename, temp_path, content_hash, options)
+    pipe.llen('job_queue')
+    queue_length = pipe.execute()[-1]
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'queue_position': queue_length,
+        'message': f'Job queued. Poll GET /job/{job_id} for results.',
+    }), 202
+
+
+@app.route('/solve_batch', methods=['POST'])
+def solve_batch():
+    """
+    Submit several frames of the same field for plate solving.
+
+    The first frame to solve publishes its center and field size as hints
+    for the remaining frames, which then use ASTAP's narrow search radius.
+
+    Form parameters:
+        file: The image files to solve (repeat the field once per file)
+        fov, ra, dec, downsample: (optional) As for /solve, applied to all files
+
+    MAX_FILE_SIZE limits the whole request, so all files of a batch together
+    must fit in it, and a batch may hold at most MAX_QUEUED_JOBS files when
+    that is set.
+
+    Returns:
+        JSON with batch_id and one job_id per file for polling status
+    """
+    if upload_too_large():
         return jsonify({
             'success': False,
-            'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'
-        }), 400
+            'error': f'Batch upload exceeds {MAX_FILE_SIZE // (1024 * 1024)}MB total limit',
+        }), 413
 
-    # Get optional parameters
-    options = {}
+    # Every queued upload waits in TEMP_DIR, so bound the queue before
+    # request.files spools the body there
+    if queue_is_full():
+        return queue_full_response()
 
-    if 'fov' in request.form:
-        try:
-            options['fov'] = float(request.form['fov'])
-        except ValueError:
-            pass
+    try:
+        files = request.files.getlist('file')
+    except OSError:
+        return storage_full_response()
 
-    if 'ra' in request.form and 'dec' in request.form:
-        try:
-            options['ra'] = float(request.form['ra'])
-            options['dec'] = float(request.form['dec'])
-        except ValueError:
-            pass
+    if not files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
 
-    if 'downsample' in request.form:
-        try:
-            options['downsample'] = int(request.form['downsample'])
-        except ValueError:
-            pass
+    for file in files:
+        error = validate_upload(file)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
 
-    # Generate job ID
-    job_id = str(uuid.uuid4())
+    # A batch bigger than the whole queue would never be accepted, so don't
+    # ask the client to retry it
+    if 0 < MAX_QUEUED_JOBS < len(files):
+        return jsonify({
+            'success': False,
+            'error': f'Batch exceeds {MAX_QUEUED_JOBS} file limit',
+        }), 413
 
-    # Save file to temp directory
-    filename = secure_filename(file.filename)
-    unique_filename = f"{job_id}_{filename}"
-    temp_path = os.path.join(TEMP_DIR, unique_filename)
-    file.save(temp_path)
+    if queue_is_full(len(files)):
+        return queue_full_response()
 
-    # Create job in Redis
-    r = get_redis()
-    job_key = f"job:{job_id}"
+    # Get optional parameters
+    options = parse_solve_options(request.form)
 
-    r.hset(job_key, mapping={
-        'id': job_id,
-        'status': 'queued',
-        'created_at': datetime.utcnow().isoformat(),
-        'filename': filename,
-        'image_path': temp_path,
-        'options': json.dumps(options),
-    })
+    batch_id = str(uuid.uuid4())
+    batch_key = f"batch:{batch_id}"
 
-    # Set expiry on job
-    r.expire(job_key, JOB_EXPIRY_SECONDS)
+    # Save every file before queuing anything, so a failure part-way
+    # through doesn't leave files in TEMP_DIR that no job points at
+    uploads = []
+    for file in files:
+        job_id = str(uuid.uuid4())
+        try:
+            uploads.append((job_id, *save_upload(file, job_id)))
+        except OSError:
+            for _, _, temp_path, _ in uploads:
+                try:
+                    os.remove(temp_path)
+                except FileNotFoundError:
+                    pass
+            return storage_full_response()
 
-    # Add to queue
-    r.rpush('job_queue', job_id)
+    jobs = [{'job_id': job_id, 'filename': filename} for job_id, filename, _, _ in uploads]
 
-    # Get queue position
-    queue_length = r.llen('job_queue')
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hset(batch_key, mapping={
+        'id': batch_id,
+        'created_at': datetime.utcnow().isoformat(),
+        'total': len(files),
+        'pending': len(files),
+        'jobs': dumps(jobs),
+    })
+    pipe.expire(batch_key, JOB_EXPIRY_SECONDS)
+    for job_id, filename, temp_path, content_hash in uploads:
+        queue_job(pipe, job_id, filename, temp_path, content_hash, options, batch_id)
+    pipe.execute()
 
     return jsonify({
         'success': True,
-        'job_id': job_id,
+        'batch_id': batch_id,
+        'jobs': jobs,
         'status': 'queued',
-        'queue_position': queue_length,
-        'message': f'Job queued. Poll GET /job/{job_id} for results.',
-    })
+        'message': f'Jobs queued. Poll GET /batch/{batch_id} or GET /job/<job_id> for results.',
+    }), 202
+
+
+@app.route('/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id: str):
+    """
+    Get batch progress.
+
+    Returns:
+        JSON with job counts, the shared position hint (once a frame has
+        solved) and the batch's job IDs
+    """
+    batch_data = get_redis().hgetall(f"batch:{batch_id}")
+
+    if not batch_data:
+        return jsonify({
+            'success': False,
+            'error': 'Batch not found or expired',
+        }), 404
+
+    pending = int(batch_data.get('pending', 0))
+    response = {
+        'batch_id': batch_id,
+        'status': 'completed' if pending <= 0 else 'pending',
+        'created_at': batch_data.get('created_at'),
+        'total': int(batch_data.get('total', 0)),
+        'pending': pending,
+        'jobs': loads(batch_data.get('jobs', '[]')),
+    }
+
+    if batch_data.get('hint'):
+        response['hint'] = loads(batch_data['hint'])
+
+    return jsonify(response)
+
+
+def wait_for_job(job_id: str, timeout: float) -> dict:
+    """
+    Block until a job finishes or the timeout expires.
+
+    Returns:
+        The job's current data after waiting
+    """
+    r = get_redis()
+    job_key = f"job:{job_id}"
+    pubsub = redis.Redis(connection_pool=pubsub_pool).pubsub(ignore_subscribe_messages=True)
+
+    try:
+        pubsub.subscribe(f"{job_key}:done")
+
+        # Re-check after subscribing so a completion in between isn't missed
+        if r.hget(job_key, 'status') in ('queued', 'processing'):
+            deadline = time.monotonic() + timeout
+            while (remaining := deadline - time.monotonic()) > 0:
+                if pubsub.get_message(timeout=remaining):
+                    break
+    finally:
+        pubsub.close()
+
+    return r.hgetall(job_key)
 
 
 @app.route('/job/<job_id>', methods=['GET'])
@@ -437,6 +853,11 @@ def get_job(job_id: str):
     """
     Get job status and results.
 
+    Query parameters:
+        wait: (optional) Seconds to wait for a queued or processing job to
+              finish before responding (max 60). When MAX_JOB_WAITERS
+              requests are already waiting, responds immediately instead.
+
     Returns:
         JSON with job status and results (if completed)
     """
@@ -451,6 +872,14 @@ def get_job(job_id: str):
             'error': 'Job not found or expired',
         }), 404
 
+    wait = min(request.args.get('wait', 0, type=float), MAX_JOB_WAIT_SECONDS)
+    if (wait > 0 and job_data.get('status') in ('queued', 'processing')
+            and job_waiters.acquire(blocking=False)):
+        try:
+            job_data = wait_for_job(job_id, wait) or job_data
+        finally:
+            job_waiters.release()
+
     response = {
         'job_id': job_id,
         'status': job_data.get('status'),
@@ -466,18 +895,15 @@ def get_job(job_id: str):
 
     # If completed or failed, include results
     if job_data.get('status') in ('completed', 'failed'):
-        result = json.loads(job_data.get('result', '{}'))
+        result = loads(job_data.get('result', '{}'))
         response.update(result)
 
     # If queued, include position
     if job_data.get('status') == 'queued':
-        # Find position in queue
-        queue = r.lrange('job_queue', 0, -1)
-        try:
-            position = queue.index(job_id) + 1
-            response['queue_position'] = position
-        except ValueError:
-            pass
+        # Find position in queue server-side (requires Redis >= 6.0.6)
+        position = r.lpos('job_queue', job_id)
+        if position is not None:
+            response['queue_position'] = position + 1
 
     return jsonify(response)
 
@@ -502,18 +928,22 @@ def cancel_job(job_id: str):
             'error': 'Can only cancel queued jobs',
         }), 400
 
-    # Remove from queue
-    r.lrem('job_queue', 1, job_id)
-
-    # Update status
-    r.hset(job_key, 'status', 'cancelled')
+    # Remove from queue, update status, release the batch slot and wake up
+    # any long-polling clients in one round-trip
+    pipe = r.pipeline(transaction=False)
+    pipe.lrem('job_queue', 1, job_id)
+    pipe.hset(job_key, 'status', 'cancelled')
+    if job_data.get('batch_id'):
+        pipe.hincrby(f"batch:{job_data['batch_id']}", 'pending', -1)
+    pipe.publish(f"{job_key}:done", 'cancelled')
+    pipe.execute()
 
     # Cleanup image file
     image_path = job_data.get('image_path')
-    if image_path and os.path.exists(image_path):
+    if image_path:
         try:
             os.remove(image_path)
-        except:
+        except FileNotFoundError:
             pass
 
     return jsonify({
@@ -523,23 +953,29 @@ def cancel_job(job_id: str):
     })
 
 
+# The API info response never changes, so encode it once at import time
+INDEX_BODY = orjson.dumps({
+    'name': 'ASTAP Plate Solver API',
+    'version': '2.0.0',
+    'endpoints': {
+        '/health': 'GET - Health check',
+        '/queue': 'GET - Queue status',
+        '/solve': 'POST - Submit image for plate solving (returns job_id)',
+        '/solve_batch': 'POST - Submit frames of one field (returns job_ids)',
+        '/batch/<batch_id>': 'GET - Get batch progress',
+        '/job/<job_id>': 'GET - Get job status and results',
+        '/job/<job_id>': 'DELETE - Cancel a queued job',
+    },
+    'supported_formats': list(ALLOWED_EXTENSIONS),
+    'max_concurrent_jobs': MAX_CONCURRENT_JOBS,
+    'job_expiry_hours': JOB_EXPIRY_SECONDS / 3600,
+})
+
+
 @app.route('/', methods=['GET'])
 def index():
     """API info endpoint."""
-    return jsonify({
-        'name': 'ASTAP Plate Solver API',
-        'version': '2.0.0',
-        'endpoints': {
-            '/health': 'GET - Health check',
-            '/queue': 'GET - Queue status',
-            '/solve': 'POST - Submit image for plate solving (returns job_id)',
-            '/job/<job_id>': 'GET - Get job status and results',
-            '/job/<job_id>': 'DELETE - Cancel a queued job',
-        },
-        'supported_formats': list(ALLOWED_EXTENSIONS),
-        'max_concurrent_jobs': MAX_CONCURRENT_JOBS,
-        'job_expiry_hours': JOB_EXPIRY_SECONDS / 3600,
-    })
+    return Response(INDEX_BODY, mimetype='application/json')
 
 
 if __name__ == '__main__':